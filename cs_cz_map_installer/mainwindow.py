@@ -13,9 +13,7 @@ from PySide.QtGui import QMessageBox
 from .dialogs import ErrorDialog
 from . import mapinstaller
 
-LOGGING_FORMAT = ("[%(asctime)s] %(levelname)s "
-                "[%(name)s.%(funcName)s:%(lineno)d] %(message)s")
-logging.basicConfig(level=logging.INFO, format=LOGGING_FORMAT)
+# Logging is configured by mapinstaller (see mapinstaller.LOGGING_LEVEL)
 logger = logging.getLogger(__name__)
 
 class MainWindow(QtGui.QMainWindow):
@@ -48,12 +46,16 @@ class MainWindow(QtGui.QMainWindow):
 
         game = QtGui.QLabel('Game:')
         self.gameDropDown = QtGui.QComboBox()
-        self.gameDropDown.addItem('Condition Zero')
-        self.gameDropDown.addItem('Counter Strike')
+        self.gameDropDown.addItem('Condition Zero', 'czero')
+        self.gameDropDown.addItem('Counter Strike', 'cstrike')
 
         installButton = QtGui.QPushButton('&Install map')
         installButton.clicked.connect(self.installAction)
 
+        self.replaceCheckBox = QtGui.QCheckBox('&Replace without comparing')
+        self.replaceCheckBox.setToolTip('Replace existing game files without'
+                ' first checking whether they differ from the map files')
+
         layout = QtGui.QGridLayout()
         layout.setSpacing(10)
 
@@ -69,6 +71,8 @@ class MainWindow(QtGui.QMainWindow):
         layout.addWidget(self.gameDropDown, 2, 1)
         layout.addWidget(installButton, 2, 2)
 
+        layout.addWidget(self.replaceCheckBox, 3, 1)
+
         centralWidget.setLayout(layout)
 
         self.prefillPaths()
@@ -77,10 +81,12 @@ class MainWindow(QtGui.QMainWindow):
         self.setWindowTitle(self.appname)
         self.show()
 
-    def installMapProgress(self, mapPath, gamePath, gameType, replace=False):
+    def installMapProgress(self, mapPath, gamePath, gameType, replace=False,
+            snapshot=None, skipIdentical=False):
         """Install map, showing a dialog box when finished"""
         try:
-            mapinstaller.install_map(mapPath, gamePath, gameType, replace=replace)
+            mapinstaller.install_map(mapPath, gamePath, gameType, replace=replace,
+                snapshot=snapshot, skip_identical=skipIdentical)
             self.dialog = QMessageBox()
             self.dialog.setIcon(QMessageBox.Information)
             self.dialog.setWindowTitle('Success')
@@ -112,22 +118,24 @@ class MainWindow(QtGui.QMainWindow):
         """The handler for the "Install Map" click button"""
         gamePath = self.gamePathEdit.text()
         mapPath = self.mapPathEdit.text()
-        game = self.gameDropDown.currentText()
-        gameIndex = self.gameDropDown.currentIndex()
-
-        gameType = 'czero'
-        if gameIndex == 0:
-            gameType = 'czero'
-        elif gameIndex == 1:
-            gameType = 'cstrike'
+        gameType = self.gameDropDown.itemData(
+            self.gameDropDown.currentIndex())
 
         if not os.path.isdir(gamePath) or not os.path.isdir(mapPath):
             self.dialog = ErrorDialog('Please enter a valid directory path')
             self.dialog.exec_()
             return
 
+        if self.replaceCheckBox.isChecked():
+            # Everything gets replaced anyway, no need to compare
+            self.installMapProgress(mapPath, gamePath, gameType, replace=True)
+            return
+
         try:
-            comparison = mapinstaller.compare_dirs(mapPath, gamePath, gameType)
+            # Walk the map once for both comparing and installing
+            snapshot = mapinstaller.snapshot_map_tree(mapPath, gameType)
+            comparison = mapinstaller.compare_dirs(mapPath, gamePath, gameType,
+                snapshot=snapshot)
             if comparison is not None:
                 file1 = comparison[0]
                 file2 = comparison[1]
@@ -149,9 +157,10 @@ class MainWindow(QtGui.QMainWindow):
                 clicked = self.dialog.clickedButton()
                 if clicked == replaceButton:
                     self.installMapProgress(mapPath, gamePath, gameType,
-                        replace=True)
+                        replace=True, snapshot=snapshot, skipIdentical=True)
                 elif clicked == skipButton:
-                    self.installMapProgress(mapPath, gamePath, gameType)
+                    self.installMapProgress(mapPath, gamePath, gameType,
+                        snapshot=snapshot)
                 elif clicked == cancelButton:
                     self.dialog = QMessageBox()
                     self.dialog.setIcon(QMessageBox.Warning)
@@ -160,7 +169,8 @@ class MainWindow(QtGui.QMainWindow):
                     self.dialog.exec_()
                     return
             else:
-                self.installMapProgress(mapPath, gamePath, gameType)
+                self.installMapProgress(mapPath, gamePath, gameType,
+                    snapshot=snapshot)
         except mapinstaller.SameDirectoryError:
             self.dialog = ErrorDialog('Entered map path and game path refer'
                 ' to the same directory.')
@@ -185,10 +195,10 @@ class MainWindow(QtGui.QMainWindow):
             drives = mapinstaller.get_win_drives()
             paths = []
             for drive in drives:
-                paths.append(drive + r'\Program Files (x86)')
-                paths.append(drive + r'\Program Files')
-                paths.append(drive)
-            self.mapPathEdit.setText(drives[0] + '\\')
+                paths.append(drive + r':\Program Files (x86)')
+                paths.append(drive + r':\Program Files')
+                paths.append(drive + ':\\')
+            self.mapPathEdit.setText(drives[0] + ':\\')
             self.gamePathEdit.setText(mapinstaller.get_game_path(paths) or '')
 
     def mapPathSelect(self):
@@ -8,15 +8,41 @@ import sys
 import os
 import string
 import hashlib
+import mmap
 import shutil
-import tempfile
+import stat
+import collections
+import ctypes
+import errno
+import functools
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 LOGGING_FORMAT = ("[%(asctime)s] %(levelname)s "
                 "[%(name)s.%(funcName)s:%(lineno)d] %(message)s")
-logging.basicConfig(level=logging.INFO, format=LOGGING_FORMAT)
+# Progress messages are only logged when CSCZ_DEBUG is set, as installing a
+# map logs a message for every directory (and, at DEBUG level, every file)
+LOGGING_LEVEL = logging.DEBUG if os.getenv('CSCZ_DEBUG') else logging.WARNING
+logging.basicConfig(level=LOGGING_LEVEL, format=LOGGING_FORMAT)
 logger = logging.getLogger(__name__)
 
+# Used by compare_dirs to hash a game file while the map file is hashed
+hash_executor = ThreadPoolExecutor(max_workers=1)
+
+# Number of threads used to copy map files into the game directory, capped
+# to keep the number of files open at once small
+COPY_WORKERS = min(8, os.cpu_count() or 4)
+
+# Maximum number of threads used by get_game_path to search for the game
+SEARCH_WORKERS = 4
+
+# Directories, relative to a search path, that games are usually installed in
+GAME_INSTALL_DIRS = (
+    os.path.join('Steam', 'steamapps', 'common', 'Half-Life'),
+    'Valve',
+)
+
 class SameDirectoryError(OSError):
     """Raised when game_path and map_path are the same directory"""
 
@@ -26,28 +52,170 @@ class InvalidGameDirectoryError(Exception):
 class InvalidMapDirectoryError(Exception):
     """Raised when given map directory is found to be invalid"""
 
-def sha1sum(filename, buf=65536):
-    """Calculate the SHA-1 checksum of a file using a specific buffer
-    size so as to avoid placing the whole file into RAM.
+def filehash(filename, buf=1 << 20):
+    """Calculate the BLAKE2b checksum of a file using a specific buffer
+    size so as to avoid placing the whole file into RAM. Files of at least
+    buf bytes are memory-mapped and hashed in a single call instead.
 
     Args:
         filename: The file to calculate the checksum of
-        buf: The buffer size to use in bytes (default: 65536)
+        buf: The buffer size to use in bytes (default: 1 MiB)
 
     Returns:
-        The corresponding SHA-1 checksum
+        The corresponding BLAKE2b (128-bit) checksum
     """
 
-    sha1 = hashlib.sha1()
-    with open(filename, 'rb') as f:
+    new_digest = functools.partial(hashlib.blake2b, digest_size=16)
+    # Unbuffered, since all reads are of buf bytes anyway
+    with open(filename, 'rb', buffering=0) as f:
+        if os.fstat(f.fileno()).st_size >= buf:
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    digest = new_digest()
+                    digest.update(mm)
+                return digest.hexdigest()
+            except (OSError, ValueError):
+                # Not mappable, fall back to reading in chunks
+                pass
+        if hasattr(hashlib, 'file_digest'):
+            # Python 3.11+, reads and hashes in C
+            return hashlib.file_digest(f, new_digest).hexdigest()
+        # Read into the same buffer every time rather than creating a new
+        # bytes object for each chunk
+        digest = new_digest()
+        data = bytearray(buf)
+        view = memoryview(data)
         while True:
-            data = f.read(buf)
-            if not data:
+            size = f.readinto(data)
+            if not size:
                 break
-            sha1.update(data)
-    return sha1.hexdigest()
+            digest.update(view[:size])
+    return digest.hexdigest()
+
+@functools.lru_cache(maxsize=4096)
+def cached_filehash(filename, size, mtime_ns):
+    """Calculate the checksum of a file like filehash, remembering it for as
+    long as the file's size and modification time stay the same, so that
+    comparing the same directories again doesn't read unchanged files again.
+
+    Args:
+        filename: The file to calculate the checksum of
+        size: The file's current size in bytes
+        mtime_ns: The file's current modification time in nanoseconds
+
+    Returns:
+        The corresponding BLAKE2b (128-bit) checksum
+    """
+    return filehash(filename)
+
+def copy_file(src, dst):
+    """Copy the contents and timestamps of file src to dst. Nothing is done
+    if src and dst are the same file.
+
+    On POSIX systems, permission bits and extended attributes aren't copied
+    unlike with shutil.copy2, which saves several system calls per file.
+    Within a filesystem the data is copied by the kernel (see
+    copy_file_range), otherwise shutil.copyfile's sendfile fast path is used.
+    On Windows shutil.copy2 is the faster of the two (it uses CopyFile2 on
+    Python 3.12+), so it is used as is.
+
+    Args:
+        src (str): the file to copy
+        dst (str): the file to copy to, replaced if it exists
+    """
+    try:
+        if os.name == 'nt':
+            shutil.copy2(src, dst, follow_symlinks=True)
+            return
+        st = os.stat(src)
+        if not copy_file_range(src, dst, st):
+            shutil.copyfile(src, dst, follow_symlinks=True)
+    except shutil.SameFileError:
+        return
+    os.utime(dst, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+def copy_file_if_changed(src, dst):
+    """Copy file src to dst like copy_file, unless dst already has the same
+    contents.
+
+    Args:
+        src (str): the file to copy
+        dst (str): the file to copy to, replaced if it exists and differs
+
+    Returns:
+        True if the file was copied, False if dst was already identical
+    """
+    try:
+        src_st = os.stat(src)
+        dst_st = os.stat(dst)
+    except FileNotFoundError:
+        pass
+    else:
+        if os.path.samestat(src_st, dst_st):
+            return False
+        if (src_st.st_size == dst_st.st_size and
+            cached_filehash(src, src_st.st_size, src_st.st_mtime_ns) ==
+            cached_filehash(dst, dst_st.st_size, dst_st.st_mtime_ns)):
+            return False
+    copy_file(src, dst)
+    return True
+
+def copy_file_range(src, dst, st):
+    """Copy the contents of file src to dst with os.copy_file_range, so that
+    the data never passes through user space. Filesystems that support it
+    (e.g. Btrfs and XFS) share the data between the files instead of
+    copying it.
+
+    Args:
+        src (str): the file to copy
+        dst (str): the file to copy to, replaced if it exists
+        st (os.stat_result): the result of os.stat(src)
 
-def install_map(map_path, game_path, game_type, replace=False):
+    Returns:
+        True if the whole file was copied, False if it couldn't be this way
+        (e.g. os.copy_file_range is unavailable, src and dst are on
+        different filesystems or the filesystem doesn't support it), in
+        which case dst may have been left incomplete
+
+    Raises:
+        shutil.SameFileError: if src and dst are the same file
+    """
+    if not hasattr(os, 'copy_file_range'):
+        return False
+    try:
+        dst_st = os.stat(dst)
+    except FileNotFoundError:
+        dst_st = os.stat(os.path.dirname(dst) or os.curdir)
+    else:
+        if os.path.samestat(st, dst_st):
+            raise shutil.SameFileError('{!r} and {!r} are the same file'
+                                        .format(src, dst))
+    if dst_st.st_dev != st.st_dev:
+        return False
+
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        remaining = st.st_size
+        while remaining > 0:
+            try:
+                copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(),
+                                            remaining)
+            except OSError as e:
+                if e.errno in (errno.EXDEV, errno.ENOSYS, errno.EOPNOTSUPP,
+                               errno.EINVAL):
+                    # Not supported here, let the caller copy it some other
+                    # way
+                    return False
+                raise
+            if not copied:
+                # Some filesystems return 0 rather than an error when they
+                # can't copy; dst is incomplete, so let the caller copy it
+                # some other way
+                return False
+            remaining -= copied
+    return True
+
+def install_map(map_path, game_path, game_type, replace=False, snapshot=None,
+                skip_identical=False):
     """
     Install map specified by map_path into game directory specified by
     game_path, assuming the game type specified by game_type.
@@ -60,6 +228,11 @@ def install_map(map_path, game_path, game_type, replace=False):
                         'czero'
         replace (bool): whether to replace files in game_path of the same name
                         as in map_path (default: False)
+        snapshot (list): the result of snapshot_map_tree() for map_path and
+                        game_type, if already available (default: None)
+        skip_identical (bool): when replacing, whether to leave alone files in
+                        game_path that already have the same contents
+                        (default: False)
 
     Raises:
         SameDirectoryError: if map_path and game_path refer to the same
@@ -67,35 +240,34 @@ def install_map(map_path, game_path, game_type, replace=False):
         InvalidGameDirectoryError: if game_path does not contain a directory
         with its name equal to game_type
     """
-    map_path = os.path.realpath(map_path)
-    game_path = os.path.realpath(game_path)
-    if map_path == game_path:
+    if is_same_dir(map_path, game_path):
         raise SameDirectoryError("'{}' and '{}' are the same directories"
                                             .format(map_path, game_path))
 
-    if game_type not in ls_dirs(game_path):
+    if not has_dir(game_path, game_type):
         raise InvalidGameDirectoryError(("'{}' is not a valid {} installation"
                                         "(directory {} not found)")
                                         .format(game_path, game_type,
                                         os.path.join(game_path, game_type)))
 
-    if game_type in ls_dirs(map_path):
-        if 'maps' not in ls_dirs(os.path.join(map_path, game_type)):
+    # Checked against twice, so list it once
+    map_dirs = ls_dirs(map_path) or set()
+
+    if game_type in map_dirs:
+        if not has_dir(os.path.join(map_path, game_type), 'maps'):
             raise InvalidMapDirectoryError(("'{}' is not a valid map directory"
                 " (directory '{}' not found").format(map_path,
                     os.path.join(map_path, 'maps')))
         # Nothing to be done, map directory is "perfect"
-        copy_map_to_game(map_path, game_path, game_type, replace=replace)
+        copy_map_to_game(map_path, game_path, game_type, replace=replace,
+                        snapshot=snapshot, skip_identical=skip_identical)
 
-    elif 'maps' in ls_dirs(map_path):
+    elif 'maps' in map_dirs:
         logger.info('Found "maps" inside')
-        with tempfile.TemporaryDirectory() as tempdir:
-            logger.info('Created temporary directory {}'.format(tempdir))
-            map_path_new = os.path.join(tempdir, game_type)
-            logger.info('TEMP: Copying {} to {}'.format(map_path, map_path_new))
-            shutil.copytree(map_path, map_path_new)
-            copy_map_to_game(tempdir, game_path, game_type, replace=replace)
-            logger.info('Removing temporary directory {}'.format(tempdir))
+        # map_path is laid out like the game_type directory itself
+        copy_map_to_game(map_path, game_path, game_type, replace=replace,
+                        src_subdir='', dst_prefix=game_type,
+                        skip_identical=skip_identical)
     else:
         logger.info('Inside else')
         found = False
@@ -109,21 +281,24 @@ def install_map(map_path, game_path, game_type, replace=False):
                 " installation (directory {} not found)").format(game_path,
                                                                 game_type,
                                         os.path.join(game_path, game_type)))
-        logger.info('map_path = ' + map_path)
-        with tempfile.TemporaryDirectory() as tempdir:
-            logger.info('Created temporary directory {}'.format(tempdir))
-            os.makedirs(os.path.join(tempdir, game_type), exist_ok=True)
-            map_path_new = os.path.join(tempdir, game_type, 'maps')
-            logger.info('TEMP: Copying {} to {}'.format(map_path, map_path_new))
-            shutil.copytree(map_path, map_path_new)
-            copy_map_to_game(tempdir, game_path, game_type, replace=replace)
-            logger.info('Removing temporary directory {}'.format(tempdir))
-
-def copy_map_to_game(map_path, game_path, game_type, replace=False):
+        logger.info('map_path = %s', map_path)
+        # map_path holds the contents of the maps directory
+        copy_map_to_game(map_path, game_path, game_type, replace=replace,
+                        src_subdir='',
+                        dst_prefix=os.path.join(game_type, 'maps'),
+                        skip_identical=skip_identical)
+
+def copy_map_to_game(map_path, game_path, game_type, replace=False,
+                    src_subdir=None, dst_prefix=None, snapshot=None,
+                    skip_identical=False):
     """
     Copy files in map_path into game_path recursively, assuming game
     type specified by game_type.
 
+    By default the game_type directory inside map_path is copied to the
+    game_type directory inside game_path. src_subdir and dst_prefix allow
+    other map layouts to be copied straight into place.
+
     Args:
         map_path (str): the map directory (e.g. C:\\my_maps\\de_dust_cz)
                         containing directory with name game_type
@@ -133,29 +308,75 @@ def copy_map_to_game(map_path, game_path, game_type, replace=False):
         game_type (str): the game type (usually either of 'czero' or 'cstrike')
         replace (bool): whether to replace files in game_path of the same name
                         as in map_path (default: False)
+        src_subdir (str): the directory inside map_path to copy from, '' for
+                        map_path itself (default: game_type)
+        dst_prefix (str): the directory inside game_path to copy into
+                        (default: src_subdir)
+        snapshot (list): the layout of the directory being copied, in the
+                        form returned by snapshot_map_tree(); walked afresh
+                        if None (default: None)
+        skip_identical (bool): when replacing, whether to leave alone files in
+                        game_path that already have the same contents (see
+                        copy_file_if_changed) (default: False)
     """
-    logger.info('About to go walk inside {}'.format(os.path.join(map_path,
-                                                                game_type)))
-    for dirpath, dirnames, filenames in os.walk(os.path.join(map_path,
-                                                            game_type)):
-        relpath = dirpath[len(map_path)+1:]
-        dirpath2 = os.path.join(game_path, relpath)
-
-        if not os.path.isdir(dirpath2):
-            logger.warning('Directory {} does not exist, creating'
-                            .format(dirpath2))
-            os.makedirs(dirpath2)
+    if src_subdir is None:
+        src_subdir = game_type
+    if dst_prefix is None:
+        dst_prefix = src_subdir
+    src_root = os.path.join(map_path, src_subdir) if src_subdir else map_path
+    dst_root = os.path.join(game_path, dst_prefix) if dst_prefix else game_path
+
+    if snapshot is None:
+        logger.info('About to go walk inside %s', src_root)
+        snapshot = walk_relative(src_root)
+
+    pairs = []
+    for relpath, filenames in snapshot:
+        dirpath = os.path.join(src_root, relpath) if relpath else src_root
+        dirpath2 = os.path.join(dst_root, relpath) if relpath else dst_root
+
+        os.makedirs(dirpath2, exist_ok=True)
+        # Files already in dirpath2, listed once rather than checked one by
+        # one; only needed when they are to be skipped
+        existing = set()
+        if not replace:
+            existing = ls_files(dirpath2) or set()
+        # Joined with a separator once, so that each file's paths are a
+        # plain concatenation rather than an os.path.join call
+        src_dir = os.path.join(dirpath, '')
+        dst_dir = os.path.join(dirpath2, '')
+        skipped = 0
         for filename in filenames:
-            fsrc = os.path.join(dirpath, filename)
-            fdst = os.path.join(dirpath2, filename)
-            if os.path.isfile(fdst) and not replace:
-                logger.info('SKIPPED Copying {} to {}'.format(fsrc, fdst))
+            fsrc = src_dir + filename
+            fdst = dst_dir + filename
+            if filename in existing:
+                logger.debug('SKIPPED Copying %s to %s', fsrc, fdst)
+                skipped += 1
+                continue
+            pairs.append((fsrc, fdst))
+        logger.info('Copying %d files from %s to %s (%d skipped)',
+                    len(filenames) - skipped, dirpath, dirpath2, skipped)
+
+    # Destination directories all exist by now, so the files themselves
+    # can be copied in parallel. Logging is done from here rather than from
+    # the worker threads so that they don't contend for the logging lock.
+    if replace and skip_identical:
+        copy = copy_file_if_changed
+    else:
+        copy = copy_file
+    copied = 0
+    with ThreadPoolExecutor(max_workers=COPY_WORKERS) as executor:
+        # Consume the results so that any error is re-raised here
+        results = executor.map(lambda pair: copy(*pair), pairs)
+        for (fsrc, fdst), result in zip(pairs, results):
+            if result is False:
+                logger.debug('SKIPPED Copying identical %s to %s', fsrc, fdst)
                 continue
-            logger.info('Copying {} to {}'.format(fsrc, fdst))
-            shutil.copy2(fsrc, fdst)
-    logger.info('Finished copying')
+            logger.debug('Copied %s to %s', fsrc, fdst)
+            copied += 1
+    logger.info('Finished copying %d files', copied)
 
-def compare_dirs(map_path, game_path, game_type):
+def compare_dirs(map_path, game_path, game_type, snapshot=None):
     """
     Compare map_path and game_path recursively, to see if there exist
     different files with the same name in game_path as in map_path.
@@ -166,45 +387,246 @@ def compare_dirs(map_path, game_path, game_type):
         map_path (str): the map directory
         game_path (str): the game directory
         game_type (str): the game type (usually either of 'czero' or 'cstrike')
+        snapshot (list): the result of snapshot_map_tree() for map_path and
+                        game_type, if already available (default: None)
 
     Returns:
         a tuple containing full path to the first differing files found
         in map_path and game_path, respectively; None if none are found
     """
-    if os.path.realpath(map_path) == os.path.realpath(game_path):
+    if is_same_dir(map_path, game_path):
         raise SameDirectoryError("'{}' and '{}' are the same directories"
             .format(map_path, game_path))
-    for dirpath, dirnames, filenames in os.walk(os.path.join(map_path,
-                                                                game_type)):
-        relpath = dirpath[len(map_path)+1:]
-        dirpath2 = os.path.join(game_path, relpath)
-
-        for filename1 in filenames:
-            filenames2 = ls_files(dirpath2)
-            if filenames2 is None:
-                break
-            for filename2 in filenames2:
-                file1 = os.path.join(dirpath, filename1)
-                file2 = os.path.join(dirpath2, filename2)
-                if (filename1 == filename2 and
-                    sha1sum(file1) != sha1sum(file2)):
+
+    # Nothing can overlap with an empty or missing game_type directory
+    try:
+        with os.scandir(os.path.join(game_path, game_type)) as it:
+            if next(it, None) is None:
+                return None
+    except OSError:
+        return None
+
+    walk_root = os.path.join(map_path, game_type)
+    game_root = os.path.join(game_path, game_type)
+    if snapshot is None:
+        prefix_len = len(walk_root) + 1
+        tree = ((dirpath[prefix_len:], filenames, dirfd)
+                for dirpath, dirnames, filenames, dirfd in walk_fd(walk_root))
+    else:
+        tree = ((relpath, filenames, None) for relpath, filenames in snapshot)
+
+    for relpath, filenames, dirfd in tree:
+        dirpath = os.path.join(walk_root, relpath) if relpath else walk_root
+        dirpath2 = os.path.join(game_root, relpath) if relpath else game_root
+
+        filenames2 = ls_files(dirpath2)
+        if filenames2 is None:
+            continue
+        for filename in filenames:
+            if filename not in filenames2:
+                continue
+            file1 = os.path.join(dirpath, filename)
+            file2 = os.path.join(dirpath2, filename)
+            # Cheap checks first: the same file can't differ from itself,
+            # and files of different sizes can't be identical
+            try:
+                if dirfd is not None:
+                    stat1 = os.stat(filename, dir_fd=dirfd)
+                else:
+                    stat1 = os.stat(file1)
+                stat2 = os.stat(file2)
+                if os.path.samestat(stat1, stat2):
+                    continue
+                if stat1.st_size != stat2.st_size:
                     return (file1, file2)
+            except OSError:
+                # e.g. a dangling symlink; it can't be shown to be identical,
+                # so let the user decide whether to replace it
+                return (file1, file2)
+            # Hash the two files concurrently, they are often on different
+            # disks
+            hash2 = hash_executor.submit(cached_filehash, file2,
+                                        stat2.st_size, stat2.st_mtime_ns)
+            if (cached_filehash(file1, stat1.st_size, stat1.st_mtime_ns)
+                    != hash2.result()):
+                return (file1, file2)
     return None
 
-def find_dir(name, path):
+def snapshot_map_tree(map_path, game_type):
+    """
+    Walk the game_type directory in map_path once and record its layout, so
+    that compare_dirs and copy_map_to_game (through install_map) don't each
+    have to walk it again.
+
+    Args:
+        map_path (str): the map directory
+        game_type (str): the game type (usually either of 'czero' or 'cstrike')
+
+    Returns:
+        a list of (relpath, filenames) tuples, one for each directory, relpath
+        being relative to the game_type directory ('' for itself); an empty
+        list if it doesn't exist
+    """
+    return list(walk_relative(os.path.join(map_path, game_type)))
+
+def walk_relative(top):
+    """
+    Walk the directory tree rooted at top like os.walk, yielding the path of
+    each directory relative to top instead of its full path. Directories
+    are read with a single os.scandir each. Links to directories (symbolic
+    links and Windows junctions, see is_link) are neither descended into nor
+    listed as files, so the walk can't loop.
+
+    Args:
+        top (str): the directory to walk
+
+    Returns:
+        a generator of (relpath, filenames) tuples, relpath being '' for top
+        itself
+    """
+    stack = [(top, '')]
+    while stack:
+        dirpath, relpath = stack.pop()
+        filenames = []
+        try:
+            with os.scandir(dirpath) as it:
+                for entry in it:
+                    if not entry.is_dir():
+                        filenames.append(entry.name)
+                    elif not is_link(entry):
+                        stack.append((entry.path,
+                                    os.path.join(relpath, entry.name)))
+        except OSError:
+            continue
+        yield relpath, filenames
+
+def walk_fd(top):
+    """
+    Walk the directory tree rooted at top like os.walk, also yielding a
+    file descriptor of each directory so that its entries can be accessed
+    without resolving the full path again. Uses os.fwalk where available.
+    Symbolic links to directories and Windows junctions (see is_junction)
+    are not descended into, so the walk can't loop.
+
+    Args:
+        top (str): the directory to walk
+
+    Returns:
+        a generator of (dirpath, dirnames, filenames, dirfd) tuples; dirfd
+        is None on platforms without os.fwalk (e.g. Windows) and is only
+        valid until the next tuple is generated
+    """
+    if hasattr(os, 'fwalk'):
+        yield from os.fwalk(top, follow_symlinks=False)
+    else:
+        for dirpath, dirnames, filenames in os.walk(top, followlinks=False):
+            # os.walk only stopped following junctions in Python 3.12
+            dirnames[:] = [dirname for dirname in dirnames
+                           if not is_junction(os.path.join(dirpath, dirname))]
+            yield dirpath, dirnames, filenames, None
+
+def is_link(entry):
+    """
+    Check whether a directory entry is a symbolic link or, on Windows, a
+    junction (see is_junction). Walks don't descend into either, as they
+    may point back up the tree.
+
+    Args:
+        entry (os.DirEntry): the entry to check
+
+    Returns:
+        True if entry is a symbolic link or junction, False otherwise
+    """
+    if entry.is_symlink():
+        return True
+    if os.name != 'nt':
+        return False
+    # DirEntry.is_junction is new in Python 3.12
+    if hasattr(entry, 'is_junction'):
+        return entry.is_junction()
+    return is_junction(entry.path)
+
+def is_junction(path):
+    """
+    Check whether path is a Windows junction (a mount point reparse point),
+    which os.walk and DirEntry.is_symlink don't treat as a link before
+    Python 3.12. Detection on older versions relies on st_reparse_tag, which
+    is available from Python 3.8.
+
+    Args:
+        path (str): the path to check
+
+    Returns:
+        True if path is a junction, False otherwise (always on platforms
+        other than Windows)
+    """
+    if os.name != 'nt':
+        return False
+    # os.path.isjunction is new in Python 3.12
+    if hasattr(os.path, 'isjunction'):
+        return os.path.isjunction(path)
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    return (getattr(st, 'st_reparse_tag', None) ==
+            getattr(stat, 'IO_REPARSE_TAG_MOUNT_POINT', 0xA0000003))
+
+def is_same_dir(path1, path2):
+    """
+    Check whether path1 and path2 refer to the same directory, comparing
+    the directories themselves rather than their names (so symbolic links
+    and case-insensitive file systems are handled).
+
+    Args:
+        path1 (str): the first path
+        path2 (str): the second path
+
+    Returns:
+        True if both paths refer to the same directory, False otherwise
+        (including if either is non-existent)
+    """
+    try:
+        return os.path.samefile(path1, path2)
+    except OSError:
+        return False
+
+def find_dir(name, path, max_depth=None, stop=None):
     """
-    Find the first directory with name found in path.
+    Find the shallowest directory with name found in path, searching
+    breadth-first so that each directory's children are checked before
+    anything deeper is read. Links to directories (see is_link) and hidden
+    directories (starting with '.') are matched but not descended into.
 
     Args:
         name (str): the name of the directory to find
         path (str): the path in which to search
+        max_depth (int): how many levels below path to descend into; None
+                        for no limit (default: None)
+        stop (threading.Event): when set, the search is abandoned before
+                        reading the next directory (default: None)
 
     Returns:
-        the first directory with name found in path, None if not found
+        the first directory with name found in path, None if not found (or
+        if the search was stopped)
     """
-    for root, dirs, files in os.walk(path):
-        if name in dirs:
-            return os.path.join(root, name)
+    queue = collections.deque([(path, 0)])
+    while queue:
+        if stop is not None and stop.is_set():
+            return None
+        current, depth = queue.popleft()
+        try:
+            with os.scandir(current) as it:
+                subdirs = [entry for entry in it if entry.is_dir()]
+        except OSError:
+            continue
+        for entry in subdirs:
+            if entry.name == name:
+                return entry.path
+        if max_depth is None or depth < max_depth:
+            queue.extend((entry.path, depth + 1) for entry in subdirs
+                         if not entry.name.startswith('.')
+                         and not is_link(entry))
     return None
 
 def ls_dirs(path):
@@ -217,10 +639,30 @@ def ls_dirs(path):
     Returns:
         a set containing all directories in path, None if path is non-existent
     """
+    try:
+        with os.scandir(path) as it:
+            return {entry.name for entry in it if entry.is_dir()}
+    except OSError:
+        return None
 
-    for dirpath, dirnames, filenames in os.walk(path):
-        return set(dirnames)
-    return None
+def has_dir(path, name):
+    """
+    Check whether path contains a directory with name, stopping at the
+    first match rather than listing the whole of path.
+
+    Args:
+        path (str): the path in which to search
+        name (str): the name of the directory to look for
+
+    Returns:
+        True if the directory exists in path, False otherwise (including if
+        path is non-existent)
+    """
+    try:
+        with os.scandir(path) as it:
+            return any(entry.name == name and entry.is_dir() for entry in it)
+    except OSError:
+        return False
 
 def ls_files(path):
     """
@@ -232,9 +674,11 @@ def ls_files(path):
     Returns:
         a set containing all files in path, None if path is non-existent
     """
-    for dirpath, dirnames, filenames in os.walk(path):
-        return set(filenames)
-    return None
+    try:
+        with os.scandir(path) as it:
+            return {entry.name for entry in it if not entry.is_dir()}
+    except OSError:
+        return None
 
 def get_game_path(paths, games=('czero', 'cstrike')):
     """
@@ -249,27 +693,65 @@ def get_game_path(paths, games=('czero', 'cstrike')):
     Returns:
         full path to the game directory if found, None otherwise
     """
+    paths = [path for path in paths if os.path.isdir(path)]
+
+    # Most games are installed in one of a few well-known places, so look
+    # there before searching any of the paths
     for path in paths:
-        if os.path.isdir(path):
+        for install_dir in GAME_INSTALL_DIRS:
             for game in games:
-                find_res = find_dir(game, path)
-                if find_res:
-                    return os.path.dirname(find_res)
-    return None
-
+                game_dir = os.path.join(path, install_dir, game)
+                if os.path.isdir(game_dir):
+                    return os.path.dirname(game_dir)
+
+    # Search all the paths at once, as they are often on different drives,
+    # but still prefer results in the order the paths and games were given
+    searches = [(game, path) for path in paths for game in games]
+    if not searches:
+        return None
+    stop = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=min(len(searches),
+                                                  SEARCH_WORKERS))
+    futures = [executor.submit(find_dir, game, path, max_depth=4, stop=stop)
+               for game, path in searches]
+    try:
+        for future in futures:
+            find_res = future.result()
+            if find_res:
+                return os.path.dirname(find_res)
+        return None
+    finally:
+        # Searches whose results are no longer needed stop after the
+        # directory they are reading, rather than scanning on in the
+        # background
+        stop.set()
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+@functools.lru_cache(maxsize=None)
 def get_win_drives():
     """
-    Return a list of available Windows drives (as in ['C', 'D', 'E']), the first
-    one being the system drive (if found using os.getenv('SystemDrive')) in
-    alphabetical order.
+    Return a tuple of available Windows drives (as in ('C', 'D', 'E')), the
+    first one being the system drive (if found using os.getenv('SystemDrive'))
+    in alphabetical order. The result is cached after the first call.
 
     Returns:
-        the list of available Windows drives, an empty list if none are found
-    """
-    drives = []
-    if os.getenv('SystemDrive'):
-        drives.append(os.getenv('SystemDrive'))
-    for drive in string.ascii_uppercase:
-        if os.path.isdir(drive + ':\\') and drive not in drives:
-            drives.append(drive)
-    return drives
+        the tuple of available Windows drives, an empty tuple if none are
+        found
+    """
+    if sys.platform == 'win32':
+        # A single call tells which drives exist, without probing (and
+        # possibly spinning up) each one
+        bitmask = ctypes.windll.kernel32.GetLogicalDrives()
+        letters = [letter for i, letter in enumerate(string.ascii_uppercase)
+                   if bitmask & (1 << i)]
+    else:
+        letters = [letter for letter in string.ascii_uppercase
+                   if os.path.isdir(letter + ':\\')]
+
+    # SystemDrive is of the form 'C:'
+    system_drive = (os.getenv('SystemDrive') or '').rstrip(':\\').upper()
+    drives = [system_drive] if system_drive else []
+    drives.extend(letter for letter in letters if letter != system_drive)
+    return tuple(drives)